@@ -458,10 +458,11 @@ class CodeDependencyError(Exception):
     pass
 
 
-def import_all(module_or_package):
+def import_all(module_or_package, skip_tests=False):
     """
     If `module_or_package` is a module, just import it; if it is a package,
-    recursively imports all the modules it contains. Returns the names of
+    recursively imports all the modules it contains (except the ones in
+    the `tests` subpackages if `skip_tests` is true). Returns the names of
     the modules that were imported as a set. The set can be empty if
     the modules were already in sys.modules.
     """
@@ -473,6 +474,8 @@ def import_all(module_or_package):
     [pkg_path] = mod_or_pkg.__path__
     n = len(pkg_path)
     for cwd, dirs, files in os.walk(pkg_path):
+        if skip_tests:
+            dirs[:] = [d for d in dirs if d != 'tests']
         if all(os.path.basename(f) != '__init__.py' for f in files):
             # the current working directory is not a subpackage
             continue
@@ -1120,7 +1123,6 @@ def random_filter(objects, reduction_factor, seed=42):
     list compared to the original list.
     """
     assert 0 < reduction_factor <= 1, reduction_factor
-    #print(f"seed in random_filter: {seed}")
     rnd = random.Random(seed)
     out = []
     for obj in objects:
@@ -1140,7 +1142,6 @@ def random_histogram(counts, nbins, seed):
     >>> random_histogram(10000, 5, 42)
     array([2043, 2015, 2050, 1930, 1962])
     """
-    #print(f"seed in random_histogram: {seed}")
     numpy.random.seed(seed)
     return numpy.histogram(numpy.random.random(counts), nbins, (0, 1))[0]
 
@@ -96,33 +96,18 @@ def extend(dset, array, **attrs):
     :param array: an array of length L
     :returns: the total length of the dataset (i.e. initial length + L)
     """
-    #print("-------------------------------------------------")
-    #print(f"array in extend: {array}")
-    #print(f"array.dtype.name: {array.dtype.name}")
-    #print(f"attrs in extend: {attrs}")
-
     length = len(dset)
-    #print(f"length: {length}")
     if len(array) == 0:
-        #print(f"len(array): {len(array)}")
         return length
     newlength = length + len(array)
-    #print(f"newlength: {newlength}")
     if array.dtype.name == 'object':  # vlen array
         shape = (newlength,) + preshape(array[0])
-        #print(f"shape: {shape}")
     else:
         shape = (newlength,) + array.shape[1:]
     dset.resize(shape)
-    #print(f"dset.resize(shape) done")
     dset[length:newlength] = array
-    #print(f"dset[length:newlength] done")
     for key, val in attrs.items():
         dset.attrs[key] = val
-
-    #print(f"return extend: {newlength}")
-    #print("-------------------------------------------------")
-
     return newlength
 
 
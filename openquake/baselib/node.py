@@ -194,6 +194,8 @@ def scientificformat(value, fmt='%13.9E', sep=' ', sep2=':'):
     '4.000000000E-03'
     >>> scientificformat([0.01, 0.02], '%10.6E')
     '1.000000E-02 2.000000E-02'
+    >>> scientificformat(numpy.array([0.01, -0.0]), '%10.6E')
+    '1.000000E-02 0.000000E+00'
     >>> scientificformat([[0.1, 0.2], [0.3, 0.4]], '%4.1E')
     '1.0E-01:2.0E-01 3.0E-01:4.0E-01'
     """
@@ -203,6 +205,13 @@ def scientificformat(value, fmt='%13.9E', sep=' ', sep2=':'):
         return value.decode('utf8')
     elif isinstance(value, str):
         return value
+    elif (isinstance(value, numpy.ndarray) and value.ndim == 1 and
+          value.dtype.kind == 'f' and fmt[-1] in 'Ee' and value.all()):
+        # fast lane for arrays of nonzero floats in scientific notation,
+        # where there is no '-0' to fix: all the values are formatted at
+        # once with a single template
+        template = sep.replace('%', '%%').join([fmt] * len(value))
+        return template % tuple(value.tolist())
     elif hasattr(value, '__len__'):
         return sep.join((scientificformat(f, fmt, sep2) for f in value))
     elif isinstance(value, (float, numpy.float64, numpy.float32)):
@@ -263,13 +272,12 @@ class StreamingXMLWriter(object):
             tag = self.nsmap.get(ns[1:], '') + _tag
         return tag
 
-    def _write(self, text):
-        """Write text by respecting the current indentlevel"""
+    def _write(self, *lines):
+        """Write lines of text by respecting the current indentlevel"""
         spaces = ' ' * (self.indent * self.indentlevel)
-        t = spaces + text.strip() + '\n'
-        if hasattr(t, 'encode'):
-            t = t.encode(self.encoding, 'xmlcharrefreplace')
-        self.stream.write(t)  # expected bytes
+        # encode the lines together and send them with a single write
+        t = ''.join(spaces + line.strip() + '\n' for line in lines)
+        self.stream.write(t.encode(self.encoding, 'xmlcharrefreplace'))
 
     def emptyElement(self, name, attrs):
         """Add an empty element (may have attributes)"""
@@ -282,11 +290,9 @@ class StreamingXMLWriter(object):
         if not attrs:
             self._write('<%s>' % name)
         else:
-            self._write('<' + name)
-            for (name, value) in sorted(attrs.items()):
-                self._write(
-                    ' %s=%s' % (name, quoteattr(scientificformat(value))))
-            self._write('>')
+            self._write('<' + name, *[
+                ' %s=%s' % (n, quoteattr(scientificformat(v)))
+                for n, v in sorted(attrs.items())] + ['>'])
         self.indentlevel += 1
 
     def end_tag(self, name):
@@ -304,9 +310,12 @@ class StreamingXMLWriter(object):
             tag = self.shorten(node.tag)
         else:
             tag = node.tag
-        with warnings.catch_warnings():  # unwanted ElementTree warning
-            warnings.simplefilter('ignore')
+        if isinstance(node, Node):
             leafnode = not node
+        else:
+            with warnings.catch_warnings():  # unwanted ElementTree warning
+                warnings.simplefilter('ignore')
+                leafnode = not node
         # NB: we cannot use len(node) to identify leafs since nodes containing
         # an iterator have no length. They are always True, even if empty :-(
         if leafnode and node.text is None:
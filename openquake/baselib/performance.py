@@ -24,6 +24,10 @@ import itertools
 from datetime import datetime
 import psutil
 import numpy
+try:
+    import numba
+except ImportError:
+    numba = None
 
 from openquake.baselib.general import humansize
 from openquake.baselib import hdf5
@@ -19,8 +19,9 @@
 import os
 from openquake.baselib.general import import_all
 
-# make sure the `base,calculators` dictionary is populated
-import_all('openquake.calculators')
+# make sure the `base,calculators` dictionary is populated; the tests
+# are not needed at runtime and are slow to import
+import_all('openquake.calculators', skip_tests=True)
 
 # import the development packages if any
 extras = os.environ.get('OQ_IMPORT_PATH', '')
@@ -170,14 +170,12 @@ class ClassicalCalculator(base.HazardCalculator):
             self.totrups += extra['totrups']
             d = dic['calc_times']  # srcid -> eff_rups, eff_sites, dt
             self.calc_times += d
-            srcids = set()
-            eff_rups = 0
-            eff_sites = 0
-            for srcid, rec in d.items():
-                srcids.add(re.sub(r':\d+$', '', srcid))
-                eff_rups += rec[0]
-                if rec[0]:
-                    eff_sites += rec[1] / rec[0]
+            srcids = {re.sub(r':\d+$', '', srcid) for srcid in d}
+            arr = numpy.array(list(d.values()), F64).reshape(-1, 3)
+            nrups = arr[:, 0]
+            ok = nrups > 0
+            eff_rups = nrups.sum()
+            eff_sites = (arr[ok, 1] / nrups[ok]).sum()
             self.by_task[extra['task_no']] = (
                 eff_rups, eff_sites, sorted(srcids))
             for grp_id, pmap in dic['pmap'].items():
@@ -233,32 +231,21 @@ class ClassicalCalculator(base.HazardCalculator):
                     rparams.add(dparam + '_')
                 zd[grp_id] = ProbabilityMap(num_levels, len(gsims))
         zd.eff_ruptures = AccumDict(accum=0)  # trt -> eff_ruptures
-        #if self.few_sites:
         self.rparams = sorted(rparams)
         for k in self.rparams:
             # variable length arrays
             if k == 'grp_id':
-                #print(k)
                 self.datastore.create_dset('rup/' + k, U16)
-
-             #############################################
-            elif k =='source_id':
-                print(k)
+            elif k == 'source_id':
                 self.datastore.create_dset('rup/' + k, hdf5.vstr)
-            #################################################
-
             elif k == 'probs_occur':  # vlen
-                #print(k)
                 self.datastore.create_dset('rup/' + k, hdf5.vfloat32)
             elif k.endswith('_'):  # array of shape (U, N)
-                #print(k)
                 self.datastore.create_dset(
                     'rup/' + k, F32, shape=(None, self.N),
                     compression='gzip')
             else:
                 self.datastore.create_dset('rup/' + k, F32)
-    #else:
-     #       self.rparams = {}
         self.by_task = {}  # task_no => src_ids
         self.totrups = 0  # total number of ruptures before collapsing
         self.maxradius = 0
@@ -347,8 +334,8 @@ class ClassicalCalculator(base.HazardCalculator):
                     es[task_no] = effsites
                     si[task_no] = ' '.join(srcids)
                 self.by_task.clear()
-        self.numrups = sum(arr[0] for arr in self.calc_times.values())
-        numsites = sum(arr[1] for arr in self.calc_times.values())
+        self.numrups, numsites, _ = numpy.array(
+            list(self.calc_times.values()), F64).reshape(-1, 3).sum(axis=0)
         logging.info('Effective number of ruptures: {:_d}/{:_d}'.format(
             int(self.numrups), self.totrups))
         logging.info('Effective number of sites per rupture: %d',
@@ -398,7 +385,7 @@ class ClassicalCalculator(base.HazardCalculator):
             pointsource_distance=self.psd,
             point_rupture_bins=oq.point_rupture_bins,
             shift_hypo=oq.shift_hypo, max_weight=max_weight,
-            collapse_level=oq.collapse_level,
+            collapse_level=oq.collapse_level, cache_poes=oq.is_ucerf(),
             max_sites_disagg=oq.max_sites_disagg)
         srcfilter = self.src_filter(self.datastore.tempname)
         for sg in src_groups:
@@ -463,6 +450,7 @@ class ClassicalCalculator(base.HazardCalculator):
             a dictionary grp_id -> hazard curves
         """
         oq = self.oqparam
+        imtls = oq.imtls  # build the DictArray only once
         data = []
         with self.monitor('saving probability maps'):
             for grp_id, pmap in pmap_by_grp_id.items():
@@ -473,7 +461,7 @@ class ClassicalCalculator(base.HazardCalculator):
                     self.datastore[key] = pmap
                     self.datastore.set_attrs(key, trt=trt)
                     extreme = max(
-                        get_extreme_poe(pmap[sid].array, oq.imtls)
+                        get_extreme_poe(pmap[sid].array, imtls)
                         for sid in pmap)
                     data.append((grp_id, trt, extreme))
         if oq.hazard_calculation_id is None and 'poes' in self.datastore:
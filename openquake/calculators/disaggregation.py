@@ -200,9 +200,10 @@ class DisaggregationCalculator(base.HazardCalculator):
         :returns: a list of Z arrays of PoEs
         """
         poes = []
+        imtls = self.oqparam.imtls
         for rlz in rlzs:
             pmap = self.pgetter.get(rlz)
-            poes.append(pmap[sid].convert(self.oqparam.imtls)
+            poes.append(pmap[sid].convert(imtls)
                         if sid in pmap else None)
         return poes
 
@@ -331,10 +332,11 @@ class DisaggregationCalculator(base.HazardCalculator):
                 (msg, humansize(oq.max_data_transfer)))
         logging.info('Estimated data transfer: %s', msg)
         self.imldict = {}  # sid, rlz, poe, imt -> iml
+        imts = list(oq.imtls)
         for s in self.sitecol.sids:
             for z, rlz in enumerate(rlzs[s]):
                 for p, poe in enumerate(self.poes_disagg):
-                    for m, imt in enumerate(oq.imtls):
+                    for m, imt in enumerate(imts):
                         self.imldict[s, rlz, poe, imt] = self.iml4[s, m, p, z]
 
         # submit #groups disaggregation tasks
@@ -493,7 +495,8 @@ class DisaggregationCalculator(base.HazardCalculator):
         logging.warning('Disaggregation by source is experimental')
         oq = self.oqparam
         groups = list(self.full_lt.get_rlzs_by_grp())
-        M = len(oq.imtls)
+        imtls = oq.imtls
+        M = len(imtls)
         P = len(self.poes_disagg)
         for (s, z), rlz in numpy.ndenumerate(rlzs):
             poes = numpy.zeros((M, P, len(groups)))
@@ -503,11 +506,11 @@ class DisaggregationCalculator(base.HazardCalculator):
                 pcurve = self.pgetter.get_pcurve(s, rlz, int(grp_id[4:]))
                 if pcurve is None:
                     continue
-                for m, imt in enumerate(oq.imtls):
-                    xs = oq.imtls[imt]
-                    ys = pcurve.array[oq.imtls(imt), 0]
+                for m, imt in enumerate(imtls):
+                    xs = imtls[imt]
+                    ys = pcurve.array[imtls(imt), 0]
                     poes[m, :, g] = numpy.interp(iml2[m], xs, ys)
-            for m, imt in enumerate(oq.imtls):
+            for m, imt in enumerate(imtls):
                 for p, poe in enumerate(self.poes_disagg):
                     pref = ('iml-%s' % oq.iml_disagg[imt] if poe is None
                             else 'poe-%s' % poe)
@@ -121,8 +121,6 @@ class EventBasedCalculator(base.HazardCalculator):
                     src.src_filter = srcfilter
             srcfilter = nofilter  # otherwise it would be ultra-slow
         for sg in self.csm.src_groups:
-
-            #print(f"sg: {sg}")
             if not sg.sources:
                 continue
             logging.info('Sending %s', sg)
@@ -146,7 +144,6 @@ class EventBasedCalculator(base.HazardCalculator):
             if dic['eff_ruptures']:
                 eff_ruptures += dic['eff_ruptures']
             if dic['rup_array']:
-                #print(f"len(dic['rup_array']): {len(dic['rup_array'])}")
                 with mon:
                     self.rupser.save(dic['rup_array'])
 
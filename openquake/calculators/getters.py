@@ -423,6 +423,7 @@ class GmfGetter(object):
         hcurves = {}  # key -> poes
         if oq.hazard_curves_from_gmfs:
             hc_mon = monitor('building hazard curves', measuremem=False)
+            imtls = oq.imtls  # build the DictArray outside of the loop
             gmfdata = self.get_gmfdata(mon)  # returned later
             hazard = self.get_hazard_by_sid(data=gmfdata)
             for sid, hazardr in hazard.items():
@@ -430,9 +431,9 @@ class GmfGetter(object):
                 for rlzi, array in dic.items():
                     with hc_mon:
                         gmvs = array['gmv']
-                        for imti, imt in enumerate(oq.imtls):
+                        for imti, imt in enumerate(imtls):
                             poes = _gmvs_to_haz_curve(
-                                gmvs[:, imti], oq.imtls[imt],
+                                gmvs[:, imti], imtls[imt],
                                 oq.ses_per_logic_tree_path)
                             hcurves[rsi2str(rlzi, sid, imt)] = poes
         if not oq.ground_motion_fields:
@@ -466,6 +467,7 @@ class GmfGetter(object):
         hcurves = {}  # key -> poes
         if oq.hazard_curves_from_gmfs:
             hc_mon = monitor('building hazard curves', measuremem=False)
+            imtls = oq.imtls  # build the DictArray outside of the loop
             gmfdata = self.get_gmfdata(mon)  # returned later
             hazard = self.get_hazard_by_sid(data=gmfdata)
             for sid, hazardr in hazard.items():
@@ -473,9 +475,9 @@ class GmfGetter(object):
                 for rlzi, array in dic.items():
                     with hc_mon:
                         gmvs = array['gmv']
-                        for imti, imt in enumerate(oq.imtls):
+                        for imti, imt in enumerate(imtls):
                             poes = _gmvs_to_haz_curve(
-                                gmvs[:, imti], oq.imtls[imt],
+                                gmvs[:, imti], imtls[imt],
                                 oq.ses_per_logic_tree_path)
                             hcurves[rsi2str(rlzi, sid, imt)] = poes
         if not oq.ground_motion_fields:
@@ -15,8 +15,16 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with OpenQuake.  If not, see <http://www.gnu.org/licenses/>.
-
+import os
+import pickle
+import unittest
+import unittest.mock as mock
+import numpy
+from openquake.baselib import hdf5
 from openquake.baselib.general import gettemp
+from openquake.hazardlib import nrml
+from openquake.hazardlib.site import SiteCollection
+from openquake.hazardlib.sourceconverter import SourceConverter
 from openquake.calculators.export import export
 from openquake.calculators.views import view
 from openquake.calculators import ucerf_base
@@ -98,3 +106,57 @@ class UcerfTestCase(CalculatorTestCase):
         fname = out['hcurves', 'csv'][0]
         self.assertEqualFiles('expected/hazard_curve-sampling.csv', fname,
                               delta=1E-6)
+
+
+class FakeUcerfSource(object):
+    def __init__(self, lon, lat):
+        self.centroids = numpy.array([[lon, lat, 0.]])
+
+    def get_centroids(self, ridx):
+        return self.centroids
+
+
+class UcerfFilterTestCase(unittest.TestCase):
+    # the bounding box prefilter must not discard sites kept by the tree
+
+    def get_indices(self, site, centroid, dist):
+        sitecol = SiteCollection.from_points([site[0]], [site[1]])
+        ufilter = ucerf_base.UcerfFilter(sitecol, {'default': dist})
+        return list(ufilter.get_indices(FakeUcerfSource(*centroid), [0], 6))
+
+    def test_near_pole(self):
+        self.assertEqual(self.get_indices((0, 85), (20, 86), 1000), [0])
+        self.assertEqual(self.get_indices((0, 85), (180, 80), 1000), [])
+
+    def test_dateline(self):
+        self.assertEqual(self.get_indices((179.9, 0), (-179.9, 0), 1000), [0])
+        self.assertEqual(self.get_indices((179.9, 0), (-170, 0), 100), [])
+
+    def test_background_distances(self):
+        # each branch gets its own unpickled filter, as in the tasks, but
+        # the distances of the background grid are computed only once
+        ucerf_base._bg_distances.clear()
+        dirname = os.path.dirname(ucerf.__file__)
+        converter = SourceConverter(50., 1.)
+        [grp] = nrml.to_python(
+            os.path.join(dirname, 'dummy_ucerf_bg_source_redux.xml'),
+            converter)
+        branch = 'FM3_1/ABM/Shaw09Mod/DsrUni_CharConst_M5Rate6.5_MMaxOff7.3_'
+        srcs = [grp[0].new(0, branch + 'NoFix_SpatSeisU2'),
+                grp[0].new(1, branch + 'NoFix_SpatSeisU3')]
+        sitecol = SiteCollection.from_points(
+            [-122.24958, -122.28338], [37.84817, 37.84545])
+        fname = gettemp(suffix='.hdf5')
+        with hdf5.File(fname, 'w') as h5:
+            h5['sitecol'] = sitecol
+        ufilter = ucerf_base.UcerfFilter(sitecol, {'default': 200}, fname)
+        expected = []
+        for src in srcs:  # compute the sids without the process cache
+            src.src_filter = ucerf_base.UcerfFilter(sitecol, {'default': 200})
+            expected.append(src.get_background_sids())
+        with mock.patch.object(ucerf_base, 'min_geodetic_distance',
+                               wraps=ucerf_base.min_geodetic_distance) as mgd:
+            for src, sids in zip(srcs, expected):
+                src.src_filter = pickle.loads(pickle.dumps(ufilter))
+                self.assertEqual(src.get_background_sids(), sids)
+        self.assertEqual(mgd.call_count, 1)
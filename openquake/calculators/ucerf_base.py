@@ -20,10 +20,12 @@ import copy
 import math
 import logging
 import pickle
+import threading
 from datetime import datetime
 import numpy
 import h5py
 import zlib
+from scipy.spatial import cKDTree
 
 from openquake.baselib.general import random_filter, AccumDict, cached_property
 from openquake.hazardlib.calc.filters import SourceFilter
@@ -31,7 +33,9 @@ from openquake.hazardlib.source.base import BaseSeismicSource
 from openquake.hazardlib.geo.geodetic import min_geodetic_distance
 from openquake.hazardlib.geo.surface.planar import PlanarSurface
 from openquake.hazardlib.geo.surface.multi import MultiSurface
-from openquake.hazardlib.geo.utils import KM_TO_DEGREES, angular_distance
+from openquake.hazardlib.geo.utils import (
+    EARTH_RADIUS, KM_TO_DEGREES, angular_distance, cross_idl,
+    spherical_to_cartesian)
 from openquake.hazardlib.source.point import PointSource
 from openquake.hazardlib.mfd import EvenlyDiscretizedMFD
 from openquake.hazardlib.tom import PoissonTOM
@@ -42,6 +46,11 @@ from openquake.hazardlib import valid
 from openquake.hazardlib.sourceconverter import SourceConverter
 
 DEFAULT_TRT = "Active Shallow Crust"
+U32 = numpy.uint32
+# (sitecol file, mtime) -> source_file -> distances of the background grid
+# from the sites, shared by the branches processed in the same process
+_bg_distances = {}
+_bg_lock = threading.Lock()
 
 
 def convert_UCERFSource(self, node):
@@ -103,9 +112,12 @@ class UcerfFilter(SourceFilter):
             if hasattr(src, 'start'):  # fault sources
                 src.src_filter = self  # hack: needed for .iter_ruptures
                 src.all_ridx = src.get_ridx()
-                ridx = set()
-                for arr in src.all_ridx:
-                    ridx.update(arr)
+                if len(src.all_ridx) == 0:  # a block without ruptures
+                    src.indices = numpy.array([], U32)
+                    continue
+                # section indices of the block, as an array and not as a
+                # Python set of numpy scalars
+                ridx = numpy.unique(numpy.concatenate(src.all_ridx))
                 src.indices = self.get_indices(src, ridx, src.mags.max())
                 if len(src.indices):
                     yield src
@@ -120,11 +132,76 @@ class UcerfFilter(SourceFilter):
         :returns: array with the IDs of the sites close to the ruptures
         """
         centroids = src.get_centroids(ridx)
-        mindistance = min_geodetic_distance(
-            (centroids[:, 0], centroids[:, 1]), self.sitecol.xyz)
+        if not hasattr(self, 'sites_bbox'):  # compute the bbox once
+            lons, lats = self.sitecol.lons, self.sitecol.lats
+            if cross_idl(lons.min(), lons.max()):
+                lons = lons % 360
+            self.sites_bbox = lons.min(), lats.min(), lons.max(), lats.max()
         idist = self.integration_distance(DEFAULT_TRT, mag)
-        indices, = (mindistance <= idist).nonzero()
-        return indices
+        # discard the centroids outside the enlarged bounding box of the
+        # sites with cheap comparisons, before building the tree
+        lons, lats = centroids[:, 0], centroids[:, 1]
+        ok = self._in_bbox(lons, lats, idist)
+        if not ok.any():
+            return numpy.array([], U32)
+        # query a tree of the centroids with all the sites at once; the
+        # sites with no centroid within the bound get an infinite distance
+        kdt = cKDTree(spherical_to_cartesian(lons[ok], lats[ok]))
+        dist, _ = kdt.query(self.sitecol.xyz,
+                            distance_upper_bound=numpy.nextafter(
+                                idist, numpy.inf))
+        return (dist <= idist).nonzero()[0].astype(U32)
+
+    def _in_bbox(self, lons, lats, idist):
+        """
+        :param lons: longitudes of the centroids
+        :param lats: latitudes of the centroids
+        :param idist: integration distance in km
+        :returns: a boolean array, False for the centroids that are surely
+                  farther than the integration distance from all the sites
+        """
+        min_lon, min_lat, max_lon, max_lat = self.sites_bbox
+        # the tree compares chord lengths, so the relevant angle is the one
+        # subtended by a chord of length idist
+        delta = 2 * math.asin(min(idist / (2 * EARTH_RADIUS), 1))
+        dlat = math.degrees(delta)
+        ok = ((lats >= max(min_lat - dlat, -90)) &
+              (lats <= min(max_lat + dlat, 90)))
+        lat = math.radians(max(abs(min_lat), abs(max_lat)))
+        if lat + delta < math.pi / 2:  # the band does not reach a pole
+            # maximum difference in longitude at angular distance delta
+            dlon = math.degrees(math.asin(math.sin(delta) / math.cos(lat)))
+            width = max_lon - min_lon + 2 * dlon
+            if width < 360:
+                # the modulo takes care of the international date line
+                ok &= (lons - (min_lon - dlon)) % 360 <= width
+        return ok
+
+    def get_background_distances(self, source_file, bg_locations):
+        """
+        :param source_file: the UCERF file containing the background grid
+        :param bg_locations: an array of shape (G, 2) with the grid locations
+        :returns: G read-only distances from the sites, cached at the
+                  process level since they are the same for all the branches
+        """
+        if self.filename:  # the filter has been unpickled in a task
+            key = self.filename, os.path.getmtime(self.filename)
+            with _bg_lock:
+                if key not in _bg_distances:
+                    _bg_distances.clear()  # keep a single sitecol in memory
+                    _bg_distances[key] = {}
+                cache = _bg_distances[key]
+        else:  # the site collection is in memory, cache it on the filter
+            cache = self.__dict__.setdefault('bg_distances', {})
+        with _bg_lock:
+            dists = cache.get(source_file)
+        if dists is None:
+            dists = min_geodetic_distance(
+                self.sitecol.xyz, (bg_locations[:, 0], bg_locations[:, 1]))
+            dists.flags.writeable = False  # shared by the branches
+            with _bg_lock:
+                cache[source_file] = dists
+        return dists
 
 
 class UCERFSource(BaseSeismicSource):
@@ -291,11 +368,14 @@ class UCERFSource(BaseSeismicSource):
         a2 = angular_distance(maxdist, bbox[1], bbox[3])
         return bbox[0] - a2, bbox[1] - a1, bbox[2] + a2, bbox[3] + a1
 
-    def get_background_sids(self):
+    def get_background_sids(self, sample_factor=None):
         """
         We can apply the filtering of the background sites as a pre-processing
         step - this is done here rather than in the sampling of the ruptures
         themselves
+
+        :param sample_factor:
+            Used to reduce the sources if OQ_SAMPLE_SOURCES is set
         """
         branch_key = self.idx_set["grid_key"]
         with h5py.File(self.source_file, 'r') as hdf5:
@@ -305,10 +385,12 @@ class UCERFSource(BaseSeismicSource):
                 idist = self.src_filter.integration_distance(DEFAULT_TRT)
             else:
                 # in classical
-                return range(len(bg_locations))
-            distances = min_geodetic_distance(
-                self.src_filter.sitecol.xyz,
-                (bg_locations[:, 0], bg_locations[:, 1]))
+                sids = list(range(len(bg_locations)))
+                if sample_factor is not None:  # hack for use in the mosaic
+                    sids = random_filter(sids, sample_factor, seed=42)
+                return sids
+            distances = self.src_filter.get_background_distances(
+                self.source_file, bg_locations)
             # Add buffer equal to half of length of median area from Mmax
             mmax_areas = self.msr.get_median_area(
                 hdf5["/".join(["Grid", branch_key, "MMax"])][()], 0.0)
@@ -386,17 +468,14 @@ class UCERFSource(BaseSeismicSource):
     def __repr__(self):
         return '<%s %s>' % (self.__class__.__name__, self.source_id)
 
-    def get_background_sources(self, sample_factor=None):
+    def get_background_sources(self, background_sids):
         """
         Turn the background model of a given branch into a set of point sources
 
-        :param sample_factor:
-            Used to reduce the sources if OQ_SAMPLE_SOURCES is set
+        :param background_sids:
+            Ordered indices of the background sites to consider, as returned
+            by .get_background_sids (or a block of them)
         """
-        background_sids = self.get_background_sids()
-        if sample_factor is not None:  # hack for use in the mosaic
-            background_sids = random_filter(
-                background_sids, sample_factor, seed=42)
         with h5py.File(self.source_file, "r") as hdf5:
             grid_loc = "/".join(["Grid", self.idx_set["grid_key"]])
             # for instance Grid/FM0_0_MEANFS_MEANMSR_MeanRates
@@ -462,7 +541,9 @@ class UCERFSource(BaseSeismicSource):
             rupture_occ.extend(background_n_occ)
         return ruptures, rupture_occ
 
-    def _sample_ruptures(self, eff_num_ses):
+    def _sample_ruptures(self, eff_num_ses, rng=None):
+        # the UCERF sampling is seeded with self.serial inside the
+        # temporal occurrence model, so rng is not used
         background_sids = self.get_background_sids()
         n_occ = AccumDict(accum=0)
         rups, occs = self.generate_event_set(background_sids, eff_num_ses)
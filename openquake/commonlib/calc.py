@@ -270,13 +270,8 @@ class RuptureSerializer(object):
         self.datastore.flush()
 
     def save_source_ids(self, source_ids_array):
-
-        #print(f"len(source_ids_array) in save_source_ids: {len(source_ids_array)}")
-
         hdf5.extend(self.datastore['source_ids'], source_ids_array)
 
-
-
     def close(self):
         """
         Save information about the rupture codes as attributes of the
@@ -19,8 +19,14 @@
 Set up some system-wide loggers
 """
 import os.path
+import sys
+import time
 import socket
 import logging
+import functools
+import threading
+import traceback
+import collections
 from datetime import datetime
 from contextlib import contextmanager
 from openquake.baselib import zeromq, config, parallel, datastore
@@ -34,6 +40,13 @@ LEVELS = {'debug': logging.DEBUG,
 DBSERVER_PORT = int(os.environ.get('OQ_DBSERVER_PORT') or config.dbserver.port)
 
 
+@functools.lru_cache()
+def _gethostbyname(hostname):
+    # the address of the DbServer does not change, so the DNS lookup
+    # is performed only once per process and not once per dbcmd
+    return socket.gethostbyname(hostname)
+
+
 def dbcmd(action, *args):
     """
     A dispatcher to the database server.
@@ -41,7 +54,7 @@ def dbcmd(action, *args):
     :param string action: database action to perform
     :param tuple args: arguments
     """
-    host = socket.gethostbyname(config.dbserver.host)
+    host = _gethostbyname(config.dbserver.host)
     sock = zeromq.Socket(
         'tcp://%s:%s' % (host, DBSERVER_PORT), zeromq.zmq.REQ, 'connect')
     with sock:
@@ -100,17 +113,73 @@ class LogFileHandler(logging.FileHandler):
 
 class LogDatabaseHandler(logging.Handler):
     """
-    Log stream handler
+    Log stream handler. The records are buffered and sent to the DbServer
+    in batches, to save a round trip per record; warnings and errors are
+    sent immediately. A daemon thread flushes the buffer periodically, so
+    that the records are not delayed during the quiet phases of a job.
+    The handler lock is held only while buffering, by .emit: .flush pops
+    the records from a thread-safe deque and sends them holding only the
+    send lock, so that a slow DbServer does not block the threads which
+    are logging and there is no lock-order inversion with logging.shutdown.
     """
+    capacity = 100  # maximum number of buffered records
+    interval = 1  # maximum number of seconds between flushes
+
     def __init__(self, job_id):
         super().__init__()
         self.job_id = job_id
+        self.buffer = collections.deque()
+        self.last_flush = time.time()
+        self.send_lock = threading.Lock()  # send the batches in order
+        self.closed = threading.Event()
+        threading.Thread(target=self._flush_periodically, daemon=True).start()
+        self.pid = None  # pid of the last record
+        self.process = None  # string processName/pid of the last record
+
+    def handle(self, record):
+        rv = super().handle(record)  # calls .emit while holding the lock
+        if rv and record.levelno >= logging.INFO and (
+                record.levelno >= logging.WARNING or
+                len(self.buffer) >= self.capacity or
+                time.time() - self.last_flush >= self.interval):
+            self.flush()
+        return rv
 
     def emit(self, record):  # pylint: disable=E0202
         if record.levelno >= logging.INFO:
-            dbcmd('log', self.job_id, datetime.utcnow(), record.levelname,
-                  '%s/%s' % (record.processName, record.process),
-                  record.getMessage())
+            if record.process != self.pid:
+                # the records come from the same process, so the process
+                # string is formatted once and not once per record
+                self.pid = record.process
+                self.process = '%s/%s' % (record.processName, record.process)
+            self.buffer.append(
+                (self.job_id, datetime.utcnow(), record.levelname,
+                 self.process, record.getMessage()))
+
+    def flush(self):
+        """
+        Send the buffered records to the DbServer
+        """
+        with self.send_lock:
+            self.last_flush = time.time()
+            popleft = self.buffer.popleft
+            records = [popleft() for _ in range(len(self.buffer))]
+            if records:
+                dbcmd('log_many', records)
+
+    def _flush_periodically(self):
+        while not self.closed.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                # report the error and keep flushing
+                sys.stderr.write('Error while sending the log records:\n')
+                traceback.print_exc(file=sys.stderr)
+
+    def close(self):
+        self.closed.set()
+        self.flush()
+        super().close()
 
 
 @contextmanager
@@ -145,6 +214,12 @@ def handle(job_id, log_level='info', log_file=None):
             logging.root.warn('The log file %s is empty!?' % log_file)
         for handler in handlers:
             logging.root.removeHandler(handler)
+        for handler in handlers:
+            try:
+                handler.close()
+            except Exception:
+                # do not mask the exception of the job, if any
+                traceback.print_exc(file=sys.stderr)
 
 
 def init(calc_id='nojob', level=logging.INFO):
@@ -16,6 +16,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with OpenQuake.  If not, see <http://www.gnu.org/licenses/>.
 import copy
+import math
 import random
 import os.path
 import pickle
@@ -29,63 +30,9 @@ from openquake.hazardlib import nrml, sourceconverter, calc, InvalidFile
 from openquake.hazardlib.lt import apply_uncertainties
 
 
-######################################################################
-# from openquake.hazardlib.source.rupture import BaseRupture
-# import tqdm
-#
-# from openquake.hazardlib.geo.mesh import surface_to_array
-# import pandas as pd
-#
-# U16 = numpy.uint16
-# U32 = numpy.uint32
-# F32 = numpy.float32
-# TWO16 = 2 ** 16
-# TWO32 = 2 ** 32
-# pmf_dt = numpy.dtype([('prob', float), ('occ', U32)])
-# events_dt = numpy.dtype([('id', U32), ('rup_id', U32), ('rlz_id', U16)])
-# code2cls = {}
-#
-# def float5(x):
-#     # a float with 5 digits
-#     return round(float(x), 5)
-#
-# def _fixfloat32(dic):
-#     # work around a TOML/numpy issue
-#     for k, v in dic.items():
-#         if isinstance(v, F32):
-#             dic[k] = float5(v)
-#         elif isinstance(v, tuple):
-#             dic[k] = [float5(x) for x in v]
-#         elif isinstance(v, numpy.ndarray):
-#             dic[k] = [[float5(y) for y in x] for x in v]
-#
-#
-# def rup2df(self):
-#     """
-#     :returns: a representation of the rupture as a dict
-#     """
-#     if not code2cls:
-#         code2cls.update(BaseRupture.init())
-#     hypo_lon = self.hypocenter.x
-#     hypo_lat = self.hypocenter.y
-#     hypo_depth = self.hypocenter.z
-#     mesh = surface_to_array(self.surface)  # shape (3, sy, sz)
-#     sy, sz = mesh.shape[1:]
-#     dic = {'serial': [int(self.rup_id)],
-#            'mag': [self.mag],
-#            'rake': [self.rake],
-#            'centroid_lon': [hypo_lon],
-#            'centroid_lat': [hypo_lat],
-#            'centroid_depth': [hypo_depth],
-#            'trt': [self.tectonic_region_type],
-#            'code': [self.code],
-#            'occurrence_rate': [self.occurrence_rate],
-#            'rupture_cls': [self.__class__.__name__],
-#            'surface_cls': [self.surface.__class__.__name__],
-#            }
-#     _fixfloat32(dic)
-#     return pd.DataFrame().from_dict(dic)
-###################################
+# below this number of background sites the UCERF point sources are
+# built on the master, since spawning the workers would cost more
+UCERF_BG_SERIAL = 1000
 
 TWO16 = 2 ** 16
 
@@ -120,6 +67,42 @@ def read_source_model(fname, converter, srcfilter, monitor):
     return {fname: sm}
 
 
+def build_background_sources(background_sids, src, monitor):
+    """
+    :param background_sids: a block of background site indices
+    :param src: a UCERFSource associated to a branch
+    :param monitor: a Monitor instance
+    :returns: a dictionary (grp_id, first index) -> point sources
+    """
+    return {(src.grp_id, background_sids[0]):
+            src.get_background_sources(background_sids)}
+
+
+def get_background_sources(srcs, sample, oq, h5=None):
+    """
+    Build the background point sources of the given UCERF branches; if
+    there are more than UCERF_BG_SERIAL background sites in total, the
+    blocks of all the branches are sent to a single Starmap
+
+    :returns: a list of point sources for each branch
+    """
+    sids = [src.get_background_sids(sample) for src in srcs]
+    tot = sum(len(s) for s in sids)
+    if tot <= UCERF_BG_SERIAL or os.environ.get('OQ_DISTRIBUTE') == 'no':
+        return [src.get_background_sources(s) for src, s in zip(srcs, sids)]
+    ct = parallel.CT if oq.concurrent_tasks is None else oq.concurrent_tasks
+    maxweight = math.ceil(tot / (ct or 1))
+    smap = parallel.Starmap(build_background_sources, h5=h5)
+    for src, background_sids in zip(srcs, sids):
+        for block in general.block_splitter(background_sids, maxweight):
+            smap.submit((block, src))
+    dic = smap.reduce()
+    parallel.Starmap.shutdown()  # save memory
+    # reorder the blocks since the tasks can return in any order
+    return [[ps for key in sorted(dic) if key[0] == src.grp_id
+             for ps in dic[key]] for src in srcs]
+
+
 def get_csm(oq, full_lt, h5=None):
     """
     Build source models from the logic tree and to store
@@ -143,12 +126,18 @@ def get_csm(oq, full_lt, h5=None):
         sample = .001 if os.environ.get('OQ_SAMPLE_SOURCES') else None
         [grp] = nrml.to_python(oq.inputs["source_model"], converter)
         src_groups = []
+        # many branches share the same magnitudes, read them only once
+        mags_by_key = {}  # magnitude dataset -> rounded magnitudes
+        bg_srcs = []  # sources of the branches with background sources
         for grp_id, sm_rlz in enumerate(full_lt.sm_rlzs):
-            sg = copy.copy(grp)
+            sg = copy.copy(grp)  # shallow copy, the sources are replaced
             src_groups.append(sg)
             src = sg[0].new(sm_rlz.ordinal, sm_rlz.value)  # one source
-            sg.mags = numpy.unique(numpy.round(src.mags))
-            del src.__dict__['mags']  # remove cache
+            key = src.idx_set['mag']
+            if key not in mags_by_key:
+                mags_by_key[key] = numpy.unique(numpy.round(src.mags))
+                del src.__dict__['mags']  # remove cache
+            sg.mags = mags_by_key[key]
             src.checksum = src.grp_id = src.id = grp_id
             src.samples = sm_rlz.samples
             if classical:
@@ -157,10 +146,13 @@ def get_csm(oq, full_lt, h5=None):
                     sg.sources = [list(src)[0]]  # take the first source
                 else:
                     sg.sources = list(src)
-                # add background point sources
-                sg.sources.extend(src.get_background_sources(sample))
+                bg_srcs.append(src)
             else:  # event_based, use one source
                 sg.sources = [src]
+        if bg_srcs:  # add background point sources
+            bg_sources = get_background_sources(bg_srcs, sample, oq, h5)
+            for src, sources in zip(bg_srcs, bg_sources):
+                src_groups[src.grp_id].sources.extend(sources)
         return CompositeSourceModel(full_lt, src_groups)
 
     logging.info('Reading the source model(s) in parallel')
@@ -190,27 +182,6 @@ def get_csm(oq, full_lt, h5=None):
         logging.info('Applied %d changes to the composite source model',
                      changes)
 
-    #res = _get_csm(full_lt, groups)
-
-    # #########################################################################
-    # logging.info(f"Working for EarthQuake Ruptures Forecast")
-    # srcs = [src for sg in res.src_groups for src in sg]
-    # ruptures = [rup for src in srcs for rup in src.iter_ruptures()]
-    #
-    # rup_df = rup2df(ruptures[0])
-    #
-    # for i in tqdm.tqdm(range(1, len(ruptures))):
-    #     rup = ruptures[i]
-    #     try:
-    #         df = rup2df(rup)
-    #         rup_df = pd.concat([rup_df, df], axis=0, ignore_index=True)
-    #         rup_df.to_csv("ruptures_from_source_tmp.csv", index=None)
-    #         rup_df.to_csv("ruptures_from_source.csv", index=None)
-    #     except Exception as e:
-    #         logging.error(f"Error in iteration {i}: {e}")
-    #         break
-    #############################################################################################3
-
     return _get_csm(full_lt, groups)
 
 
@@ -269,7 +240,8 @@ def reduce_sources(sources_with_same_id):
     """
     out = []
     for src in sources_with_same_id:
-        dic = {k: v for k, v in vars(src).items() if k not in 'grp_id samples'}
+        dic = {k: v for k, v in vars(src).items()
+               if k not in '_grp_id grp_ids samples'}
         src.checksum = zlib.adler32(pickle.dumps(dic, protocol=4))
     for srcs in general.groupby(
             sources_with_same_id, operator.attrgetter('checksum')).values():
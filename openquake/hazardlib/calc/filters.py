@@ -21,6 +21,7 @@ import sys
 import time
 import logging
 import operator
+import threading
 import collections.abc
 from contextlib import contextmanager
 import numpy
@@ -35,6 +36,9 @@ from openquake.hazardlib.geo.utils import (
 U32 = numpy.uint32
 MAX_DISTANCE = 2000  # km, ultra big distance used if there is no filter
 grp_id = operator.attrgetter('grp_id')
+# (filename, mtime) -> sitecol, the last site collection read in the process
+_sitecol_cache = {}
+_sitecol_lock = threading.Lock()
 
 
 @contextmanager
@@ -248,7 +252,9 @@ class SourceFilter(object):
     @property
     def sitecol(self):
         """
-        Read the site collection from .filename and cache it
+        Read the site collection from .filename and cache it. The
+        last site collection read is also cached at the process level,
+        so that the tasks running in the same worker do not read it again
         """
         if 'sitecol' in vars(self):
             return self.__dict__['sitecol']
@@ -256,8 +262,17 @@ class SourceFilter(object):
             return
         elif not os.path.exists(self.filename):
             raise FileNotFoundError('%s: shared_dir issue?' % self.filename)
-        with hdf5.File(self.filename, 'r') as h5:
-            self.__dict__['sitecol'] = sc = h5.get('sitecol')
+        key = self.filename, os.path.getmtime(self.filename)
+        with _sitecol_lock:  # the tasks can run in a thread pool
+            if key not in _sitecol_cache:
+                _sitecol_cache.clear()  # keep a single sitecol in memory
+                with hdf5.File(self.filename, 'r') as h5:
+                    sc = h5.get('sitecol')
+                # the sitecol is shared by the tasks of the process
+                sc.array.flags.writeable = False
+                _sitecol_cache[key] = sc
+            sc = _sitecol_cache[key]
+        self.__dict__['sitecol'] = sc
         return sc
 
     def get_rectangle(self, src):
@@ -371,7 +386,9 @@ class SourceFilter(object):
                 continue
             indices = self.sitecol.within_bbox(box)
             if len(indices):
-                src.indices = indices
+                # site IDs are uint32, this halves the size of the
+                # indices sent to the workers together with the sources
+                src.indices = U32(indices)
                 yield src
 
     def within_bbox(self, srcs):
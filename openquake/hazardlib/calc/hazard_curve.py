@@ -57,7 +57,7 @@ import operator
 from openquake.baselib.performance import Monitor
 from openquake.baselib.parallel import sequential_apply
 from openquake.baselib.general import DictArray, groupby, AccumDict
-from openquake.hazardlib.probability_map import ProbabilityMap
+from openquake.hazardlib.probability_map import ProbabilityMap, compose
 from openquake.hazardlib.gsim.base import ContextMaker, PmapMaker
 from openquake.hazardlib.calc.filters import SourceFilter
 from openquake.hazardlib.sourceconverter import SourceGroup
@@ -133,10 +133,6 @@ def classical(group, src_filter, gsims, param, monitor=Monitor()):
         tom = getattr(group, 'temporal_occurrence_model')
         pmap = _cluster(param['imtls'], tom, gsims, pmap)
 
-    #########################
-    #print(f"rup_data in classical: {rup_data}")
-    ##########################
-
     return dict(pmap=pmap, calc_times=calc_times, rup_data=rup_data,
                 extra=extra)
 
@@ -209,7 +205,8 @@ def calc_hazard_curves(
                 classical, (group.sources, srcfilter, [gsim], param),
                 weight=operator.attrgetter('weight'))
         for dic in it:
+            # the results are composed in place as soon as they arrive
             for grp_id, pval in dic['pmap'].items():
-                pmap |= pval
+                compose(pmap, pval)
     sitecol = getattr(srcfilter, 'sitecol', srcfilter)
     return pmap.convert(imtls, len(sitecol.complete))
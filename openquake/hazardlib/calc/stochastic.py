@@ -25,7 +25,6 @@ import logging
 import time
 
 import numpy
-from scipy.special import loggamma
 
 from openquake.baselib import hdf5
 from openquake.baselib.general import AccumDict
@@ -187,18 +186,11 @@ def sample_cluster(sources, srcfilter, num_ses, param):
     # Note that using a single time interval corresponding to the product
     # of the investigation time and the number of realisations as we do
     # here is admitted only in the case of a time-independent model
-    #print(f"Calling numpy.random.poisson w/lambda:")
-    #print(f"lambda=rate * time_span * samples * num_ses: {rate * time_span * samples * num_ses}")
-    #print(f"rate={rate}, time_span={time_span}, samples={samples}, num_ses={num_ses}")
-
-    ## Sampling
     lambda_ = rate * time_span * samples * num_ses
 
     # sampling
     grp_num_occ = numpy.random.poisson(lambda_)
 
-
-    #print(f"len(grp_num_occ): {len(grp_num_occ)}")
     # Now we process the sources included in the group. Possible cases:
     # * The group is a cluster. In this case we choose one rupture per each
     #   source; uncertainty in the ruptures can be handled in this case
@@ -22,6 +22,7 @@ import pprint
 import logging
 import warnings
 import operator
+import threading
 import itertools
 import collections
 import numpy
@@ -41,8 +42,62 @@ bymag = operator.attrgetter('mag')
 bydist = operator.attrgetter('dist')
 I16 = numpy.int16
 F32 = numpy.float32
+F64 = numpy.float64
 KNOWN_DISTANCES = frozenset(
     'rrup rx ry0 rjb rhypo repi rcdpp azimuth azimuth_cp rvolc'.split())
+# rupture parameter -> function extracting it from the rupture
+RUP_PARAM_GETTERS = {
+    'mag': lambda rup: rup.mag,
+    'strike': lambda rup: rup.surface.get_strike(),
+    'dip': lambda rup: rup.surface.get_dip(),
+    'rake': lambda rup: rup.rake,
+    'ztor': lambda rup: rup.surface.get_top_edge_depth(),
+    'hypo_lon': lambda rup: rup.hypocenter.longitude,
+    'hypo_lat': lambda rup: rup.hypocenter.latitude,
+    'hypo_depth': lambda rup: rup.hypocenter.depth,
+    'width': lambda rup: rup.surface.get_width()}
+# (gsims, levels, rupture parameters, sites, distances) -> read-only PoEs,
+# shared by all the tasks of the same calculation running in the same
+# process, so that the PoEs of a rupture repeated in many branches are
+# computed once per worker; like filters._sitecol_cache, only the PoEs of
+# the last calculation are kept
+_poes_cache = {}
+_poes_calc = [None]  # key of the calculation owning the cached PoEs
+_poes_lock = threading.Lock()
+_poes_nbytes = 0  # size of the cached PoEs and keys
+POES_CACHE_SIZE = 256 * 1024 ** 2  # bytes, the cache is cleared when full
+
+
+def _reset_poes_cache(calc_key):
+    # clear the cache if it contains the PoEs of another calculation
+    global _poes_nbytes
+    with _poes_lock:
+        if _poes_calc[0] != calc_key:
+            _poes_cache.clear()
+            _poes_nbytes = 0
+            _poes_calc[0] = calc_key
+
+
+def _get_cached_poes(calc_key, key):
+    # return the cached PoEs for the given context or None
+    with _poes_lock:
+        if _poes_calc[0] == calc_key:
+            return _poes_cache.get(key)
+
+
+def _cache_poes(calc_key, key, poes):
+    # store the PoEs in the process-level cache, clearing it when too big
+    global _poes_nbytes
+    nbytes = poes.nbytes + sum(len(k) for k in key if isinstance(k, bytes))
+    poes.flags.writeable = False  # the cached PoEs are shared
+    with _poes_lock:
+        if _poes_calc[0] != calc_key:  # reset by another calculation
+            return
+        if _poes_nbytes + nbytes > POES_CACHE_SIZE:
+            _poes_cache.clear()
+            _poes_nbytes = 0
+        _poes_cache[key] = poes
+        _poes_nbytes += nbytes
 
 
 def get_distances(rupture, sites, param):
@@ -50,7 +105,7 @@ def get_distances(rupture, sites, param):
     :param rupture: a rupture
     :param sites: a mesh of points or a site collection
     :param param: the kind of distance to compute (default rjb)
-    :returns: an array of distances from the given sites
+    :returns: a C-contiguous array of distances from the given sites
     """
     if not rupture.surface:  # PointRupture
         dist = rupture.hypocenter.distance_to_mesh(sites)
@@ -77,6 +132,9 @@ def get_distances(rupture, sites, param):
         dist = numpy.zeros_like(sites.lons)
     else:
         raise ValueError('Unknown distance measure %r' % param)
+    # some surfaces return strided views; the GSIMs work on whole arrays
+    # and are faster on contiguous memory (no copy if already contiguous)
+    dist = numpy.ascontiguousarray(dist)
     dist.flags.writeable = False
     return dist
 
@@ -97,7 +155,9 @@ def get_num_distances(gsims):
 
 class RupData(object):
     """
-    A class to collect rupture information into an AccumDict
+    A class to collect rupture information into an AccumDict, with a
+    column per parameter (structure of arrays); the distances are stored
+    in arrays of shape (U, N)
     """
     def __init__(self, cmaker, data=None):
         self.cmaker = cmaker
@@ -123,7 +183,7 @@ class RupData(object):
             if numpy.isnan(rup.occurrence_rate):  # for nonparametric ruptures
                 probs_occur = rup.probs_occur
             else:
-                probs_occur = numpy.zeros(0, numpy.float64)
+                probs_occur = numpy.zeros(0, F32)
             self.data['occurrence_rate'].append(rup.occurrence_rate)
             self.data['probs_occur'].append(probs_occur)
             self.data['weight'].append(rup.weight or numpy.nan)
@@ -132,8 +192,7 @@ class RupData(object):
             for rup_param in self.cmaker.REQUIRES_RUPTURE_PARAMETERS:
                 self.data[rup_param].append(getattr(rup, rup_param))
             for dst_param in params:  # including lon, lat
-                for s, dst in zip(sites.sids, getattr(dctx, dst_param)):
-                    data[dst_param + '_'][r, s] = dst
+                data[dst_param + '_'][r, sites.sids] = getattr(dctx, dst_param)
 
 
     def dictarray(self):
@@ -145,7 +204,10 @@ class RupData(object):
             if k.endswith('_'):
                 dic[k] = numpy.concatenate(v)
             else:
-                dic[k] = numpy.array(v)
+                arr = numpy.array(v)
+                # the rupture parameters are stored as float32 in the
+                # datastore, so there is no point in sending float64
+                dic[k] = arr.astype(F32) if arr.dtype == F64 else arr
         return dic
 
 
@@ -159,6 +221,7 @@ class ContextMaker(object):
         param = param or {}
         self.max_sites_disagg = param.get('max_sites_disagg', 10)
         self.collapse_level = param.get('collapse_level', False)
+        self.cache_poes = param.get('cache_poes', False)
         self.point_rupture_bins = param.get('point_rupture_bins', 20)
         self.trt = trt
         self.gsims = gsims
@@ -182,6 +245,11 @@ class ContextMaker(object):
         self.reqv = param.get('reqv')
         if self.reqv is not None:
             self.REQUIRES_DISTANCES.add('repi')
+        # the parameters to compute for each rupture, determined once
+        # for all since the gsims are fixed
+        self.dist_params = sorted(
+            self.REQUIRES_DISTANCES - {self.filter_distance})
+        self.rup_params = sorted(self.REQUIRES_RUPTURE_PARAMETERS)
         if hasattr(gsims, 'items'):
             # gsims is actually a dict rlzs_by_gsim
             # since the ContextMaker must be used on ruptures with the
@@ -251,30 +319,13 @@ class ContextMaker(object):
         """
         Add .REQUIRES_RUPTURE_PARAMETERS to the rupture
         """
-
-        for param in self.REQUIRES_RUPTURE_PARAMETERS:
-            if param == 'mag':
-                value = rupture.mag
-            elif param == 'strike':
-                value = rupture.surface.get_strike()
-            elif param == 'dip':
-                value = rupture.surface.get_dip()
-            elif param == 'rake':
-                value = rupture.rake
-            elif param == 'ztor':
-                value = rupture.surface.get_top_edge_depth()
-            elif param == 'hypo_lon':
-                value = rupture.hypocenter.longitude
-            elif param == 'hypo_lat':
-                value = rupture.hypocenter.latitude
-            elif param == 'hypo_depth':
-                value = rupture.hypocenter.depth
-            elif param == 'width':
-                value = rupture.surface.get_width()
-            else:
+        for param in self.rup_params:
+            try:
+                getter = RUP_PARAM_GETTERS[param]
+            except KeyError:
                 raise ValueError('%s requires unknown rupture parameter %r' %
                                  (type(self).__name__, param))
-            setattr(rupture, param, value)
+            setattr(rupture, param, getter(rupture))
 
     def make_contexts(self, sites, rupture, filt=True):
         """
@@ -302,9 +353,8 @@ class ContextMaker(object):
             sites, dctx = self.filter(sites, rupture)
         else:
             dctx = self.get_dctx(sites, rupture)
-        for param in self.REQUIRES_DISTANCES - set([self.filter_distance]):
-            distances = get_distances(rupture, sites, param)
-            setattr(dctx, param, distances)
+        for param in self.dist_params:
+            setattr(dctx, param, get_distances(rupture, sites, param))
         reqv_obj = (self.reqv.get(self.trt) if self.reqv else None)
         if reqv_obj and isinstance(rupture.surface, PlanarSurface):
             reqv = reqv_obj.get(dctx.repi, rupture.mag)
@@ -405,7 +455,21 @@ class PmapMaker(object):
         self.poe_mon = cmaker.mon('get_poes', measuremem=False)
         self.pne_mon = cmaker.mon('composing pnes', measuremem=False)
         self.gmf_mon = cmaker.mon('computing mean_std', measuremem=False)
-
+        # the cached PoEs of a previous calculation are dropped as soon
+        # as a task of another calculation starts in the same process
+        self.poes_calc = (cmaker.mon.calc_id,
+                          getattr(srcfilter, 'filename', None))
+        if self.cache_poes or _poes_cache:
+            _reset_poes_cache(self.poes_calc)
+        if self.cache_poes:
+            # the part of the cache keys which is the same for all contexts
+            ll = self.loglevels
+            self.poes_key = (self.trunclevel, tuple(ll), ll.array.tobytes(),
+                             tuple((str(gsim), gsim.minimum_distance,
+                                    tuple(imt for imt in ll
+                                          if hasattr(gsim, 'weight') and
+                                          gsim.weight[imt] == 0))
+                                   for gsim in self.gsims))
 
     def _gen_ctxs(self, rups, sites, grp_ids):
         # generate triples (rup, sites, dctx)
@@ -430,24 +494,50 @@ class PmapMaker(object):
             self.numsites += len(r_sites)
             yield rup, r_sites, dctx
 
+    def _ctx_key(self, rup, r_sites, dctx):
+        # the PoEs do not depend on the occurrence rate of the rupture,
+        # only on the gsims, the levels, the rupture parameters, the sites
+        # and the distances
+        lst = [self.poes_key, r_sites.sids.tobytes()]
+        lst.extend(getattr(rup, par) for par in self.rup_params)
+        for par in sorted(self.REQUIRES_SITES_PARAMETERS):
+            lst.append(getattr(r_sites, par).tobytes())
+        for dst in sorted(self.REQUIRES_DISTANCES):
+            lst.append(numpy.ascontiguousarray(getattr(dctx, dst)).tobytes())
+        return tuple(lst)
+
+    def _get_poes(self, rup, r_sites, dctx):
+        # compute the PoEs for the given context; if cache_poes is set
+        # reuse the PoEs computed for an identical context in the same
+        # process, for instance in a previous task for another UCERF branch
+        if self.cache_poes:
+            key = self._ctx_key(rup, r_sites, dctx)
+            poes = _get_cached_poes(self.poes_calc, key)
+            if poes is not None:
+                return poes
+        with self.gmf_mon:
+            mean_std = base.get_mean_std(  # shape (2, N, M, G)
+                r_sites, rup, dctx, self.imts, self.gsims)
+        with self.poe_mon:
+            ll = self.loglevels
+            poes = base.get_poes(mean_std, ll, self.trunclevel, self.gsims)
+            for g, gsim in enumerate(self.gsims):
+                for m, imt in enumerate(ll):
+                    if hasattr(gsim, 'weight') and gsim.weight[imt] == 0:
+                        # set by the engine when parsing the gsim logictree
+                        # when 0 ignore the gsim: see _build_trts_branches
+                        poes[:, ll(imt), g] = 0
+        if self.cache_poes:
+            _cache_poes(self.poes_calc, key, poes)
+        return poes
+
     def _update_pmap(self, ctxs, pmap=None):
         # compute PoEs and update pmap
         if pmap is None:  # for src_indep
             pmap = self.pmap
         for rup, r_sites, dctx in ctxs:
             # this must be fast since it is inside an inner loop
-            with self.gmf_mon:
-                mean_std = base.get_mean_std(  # shape (2, N, M, G)
-                    r_sites, rup, dctx, self.imts, self.gsims)
-            with self.poe_mon:
-                ll = self.loglevels
-                poes = base.get_poes(mean_std, ll, self.trunclevel, self.gsims)
-                for g, gsim in enumerate(self.gsims):
-                    for m, imt in enumerate(ll):
-                        if hasattr(gsim, 'weight') and gsim.weight[imt] == 0:
-                            # set by the engine when parsing the gsim logictree
-                            # when 0 ignore the gsim: see _build_trts_branches
-                            poes[:, ll(imt), g] = 0
+            poes = self._get_poes(rup, r_sites, dctx)
             with self.pne_mon:
                 # pnes and poes of shape (N, L, G)
                 pnes = rup.get_probability_no_exceedance(poes)
@@ -580,17 +670,26 @@ class PmapMaker(object):
         :param ctxs: a list of pairs (rup, dctx)
         :returns: collapsed contexts
         """
-        def params(ctx):
-            rup, dctx = ctx
-            lst = []
-            for par in self.REQUIRES_RUPTURE_PARAMETERS:
-                lst.append(getattr(rup, par))
+        if len(ctxs) < 2:
+            return ctxs
+        # build a matrix with a row per context containing the rupture
+        # parameters and the rounded distances; all the contexts have the
+        # same sites, since they are built with filt=False
+        rows = []
+        for rup, dctx in ctxs:
+            row = [getattr(rup, par)
+                   for par in self.REQUIRES_RUPTURE_PARAMETERS]
             for dst in self.REQUIRES_DISTANCES:
-                lst.extend(numpy.round(getattr(dctx, dst)))
-            return tuple(lst)
-
+                row.extend(numpy.round(getattr(dctx, dst)))
+            rows.append(row)
+        _uniq, first, inv = numpy.unique(
+            numpy.array(rows), axis=0, return_index=True, return_inverse=True)
+        groups = [[] for _ in first]
+        for ctx, i in zip(ctxs, inv):
+            groups[i].append(ctx)
         out = []
-        for values in groupby(ctxs, params).values():
+        for i in numpy.argsort(first):  # keep the original ordering
+            values = groups[i]
             if len(values) == 1:
                 out.append(values[0])
             else:
@@ -702,7 +801,8 @@ class DistancesContext(BaseContext):
     and the rupture. Every GSIM class is required to declare what
     :attr:`distance measures <GroundShakingIntensityModel.REQUIRES_DISTANCES>`
     does it need. Only those required values are calculated and made available
-    in a result context object.
+    in a result context object. The distances built by the ContextMaker
+    are C-contiguous arrays.
     """
     _slots_ = ('rrup', 'rx', 'rjb', 'rhypo', 'repi', 'ry0', 'rcdpp',
                'azimuth', 'hanging_wall', 'rvolc')
@@ -724,7 +824,7 @@ class DistancesContext(BaseContext):
         for dist, array in vars(self).items():
             small_distances = array < minimum_distance
             if small_distances.any():
-                array = numpy.array(array)  # make a copy first
+                array = numpy.array(array, order='C')  # make a copy first
                 array[small_distances] = minimum_distance
                 array.flags.writeable = False
             setattr(ctx, dist, array)
@@ -20,7 +20,6 @@ Module exports :class:`MultiGMPE`, which can create a composite of
 multiple GMPEs for different IMTs when passed a dictionary of ground motion
 models organised by IMT type or by a string describing the association
 """
-import collections
 from openquake.hazardlib import const
 from openquake.hazardlib.gsim.base import GMPE, registry
 from openquake.hazardlib.imt import from_string
@@ -34,7 +33,7 @@ REQUIRES_DISTANCES
 '''.split()
 
 
-class MultiGMPE(GMPE, collections.abc.Mapping):
+class MultiGMPE(GMPE):
     """
     The MultiGMPE can call ground motions for various IMTs when instantiated
     with a dictionary of ground motion models organised by IMT or a string
@@ -79,6 +78,13 @@ class MultiGMPE(GMPE, collections.abc.Mapping):
                 raise ValueError("IMT %s not supported by %s" % (imt, gsim))
             for name in uppernames:
                 getattr(self, name).update(getattr(gsim, name))
+        self._hash = self._get_hash()
+
+    def _get_hash(self):
+        # the underlying gsims are not changed after instantiation
+        items = tuple((imt, str(gsim)) for imt, gsim in
+                      sorted(self.kwargs.items()))
+        return hash(items)
 
     def __iter__(self):
         yield from self.kwargs
@@ -89,10 +95,37 @@ class MultiGMPE(GMPE, collections.abc.Mapping):
     def __len__(self):
         return len(self.kwargs)
 
+    def __contains__(self, imt):
+        return imt in self.kwargs
+
+    # the mapping protocol is implemented directly, without the
+    # collections.abc.Mapping mixin, since instances are hashed and
+    # compared often; the base GMPE class has a __dict__, so there are no
+    # __slots__ here
+    def keys(self):
+        return self.kwargs.keys()
+
+    def values(self):
+        return self.kwargs.values()
+
+    def items(self):
+        return self.kwargs.items()
+
     def __hash__(self):
-        items = tuple((imt, str(gsim)) for imt, gsim in
-                      sorted(self.kwargs.items()))
-        return hash(items)
+        return self._hash
+
+    def __eq__(self, other):
+        if isinstance(other, MultiGMPE):
+            return self._hash == other._hash and self.kwargs == other.kwargs
+        return super().__eq__(other)
+
+    def __getstate__(self):
+        # the hash of strings changes across processes, so it is not pickled
+        return {k: v for k, v in vars(self).items() if k != '_hash'}
+
+    def __setstate__(self, state):
+        vars(self).update(state)
+        self._hash = self._get_hash()
 
     def get_mean_and_stddevs(self, sctx, rctx, dctx, imt, stddev_types):
         """
@@ -15,7 +15,9 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with OpenQuake.  If not, see <http://www.gnu.org/licenses/>.
+import functools
 from openquake.baselib.python3compat import zip
+from openquake.baselib.performance import numba
 import numpy
 
 F32 = numpy.float32
@@ -23,6 +25,30 @@ F64 = numpy.float64
 BYTES_PER_FLOAT = 8
 
 
+@functools.lru_cache()
+def _poes_ufunc():
+    # a real ufunc computing 1 - (1 - a) * (1 - b) in a single pass,
+    # without the temporary arrays of the pure numpy version; it is
+    # compiled at the first call and not when importing hazardlib
+    return numba.vectorize(['f4(f4, f4)', 'f8(f8, f8)'])(
+        lambda a, b: 1. - (1. - a) * (1. - b))
+
+
+def _combine_poes(a, b, out=None):
+    # pure numpy version, used when numba is not installed
+    tmp = (1. - a) * (1. - b)
+    return numpy.subtract(1., tmp, out=tmp if out is None else out)
+
+
+def combine_poes(a, b, out=None):
+    """
+    :returns: the composition 1 - (1 - a) * (1 - b) of two PoE arrays
+    """
+    if numba:
+        return _poes_ufunc()(a, b, out=out)
+    return _combine_poes(a, b, out)
+
+
 class AllEmptyProbabilityMaps(ValueError):
     """
     Raised by get_shape(pmaps) if all passed probability maps are empty
@@ -58,7 +84,7 @@ class ProbabilityCurve(object):
         if other == 0:
             return self
         else:
-            return self.__class__(1. - (1. - self.array) * (1. - other.array))
+            return self.__class__(combine_poes(self.array, other.array))
     __ror__ = __or__
 
     def __iadd__(self, other):
@@ -374,5 +400,28 @@ def combine(pmaps):
     shape = get_shape(pmaps)
     res = ProbabilityMap(shape[1], shape[2])
     for pmap in pmaps:
-        res |= pmap
+        compose(res, pmap)
     return res
+
+
+def compose(acc, pmap):
+    """
+    Equivalent to `acc |= pmap`, but the curves of `acc` are updated in
+    place, without building an intermediate curve per site; the curves
+    of `pmap` are copied, so they are never shared with `acc`.
+
+    :param acc: a ProbabilityMap used as an accumulator
+    :param pmap: a ProbabilityMap with the same shape
+    :returns: the accumulator
+    """
+    if not pmap:
+        return acc
+    if (pmap.shape_y, pmap.shape_z) != (acc.shape_y, acc.shape_z):
+        raise ValueError('%s has inconsistent shape with %s' % (pmap, acc))
+    for sid, pcurve in pmap.items():
+        if sid in acc:
+            array = acc[sid].array
+            combine_poes(array, pcurve.array, out=array)
+        else:
+            acc[sid] = ProbabilityCurve(pcurve.array.copy())
+    return acc
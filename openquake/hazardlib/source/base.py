@@ -19,13 +19,49 @@ seismic sources.
 """
 import abc
 import logging
+import itertools
 
 import numpy
-from scipy.special import loggamma
 
 from openquake.hazardlib.geo import Point
 from openquake.hazardlib.source.rupture import ParametricProbabilisticRupture
 
+MAX_RANDOM = 1_000_000  # max number of random numbers drawn at once
+RUPTURE_BLOCK = 1000  # number of fault ruptures sampled at once
+
+
+def sample_occurrences(ruptures, num_ses, mutex_weight=1, rng=numpy.random):
+    """
+    Sample the number of occurrences of nonparametric ruptures with
+    'Inverse Transform Sampling', drawing the random numbers with a single
+    call per block of ruptures and in the same order as calling
+    `rup.sample_number_of_occurrences(num_ses)` rupture by rupture.
+
+    :param ruptures: a list of nonparametric ruptures
+    :param num_ses: number of stochastic event sets * number of samples
+    :param mutex_weight: the occurrences are kept with this probability
+    :param rng: a numpy RandomState (default the global numpy.random state)
+    :returns: an array with the total number of occurrences per rupture
+    """
+    ndraws = 2 if mutex_weight < 1 else 1
+    blocksize = max(MAX_RANDOM // (num_ses * ndraws), 1)
+    num_occ = numpy.zeros(len(ruptures), int)
+    for start in range(0, len(ruptures), blocksize):
+        rups = ruptures[start:start + blocksize]
+        # the cdfs padded with infinities (never below a random number)
+        cdf = numpy.full((len(rups), max(len(r.probs_occur) for r in rups)),
+                         numpy.inf)
+        for i, rup in enumerate(rups):
+            cdf[i, :len(rup.probs_occur)] = numpy.cumsum(rup.probs_occur)
+        rnd = rng.random_sample((len(rups), ndraws, num_ses))
+        # same as numpy.digitize(rnd, cdf) row by row
+        occurs = (cdf[:, None, :] <= rnd[:, 0, :, None]).sum(axis=2)
+        if ndraws == 2:
+            # consider only the occurrencies below the mutex_weight
+            occurs *= rnd[:, 1] < mutex_weight
+        num_occ[start:start + blocksize] = occurs.sum(axis=1)
+    return num_occ
+
 
 class BaseSeismicSource(metaclass=abc.ABCMeta):
     """
@@ -45,7 +81,8 @@ class BaseSeismicSource(metaclass=abc.ABCMeta):
     splittable = True
     serial = 0  # set in init_serials
     checksum = 0  # set in source_reader
-    grp_id = ()
+    _grp_id = ()  # set by the grp_id property
+    grp_ids = ()  # set by the grp_id property
 
     @abc.abstractproperty
     def MODIFICATIONS(self):
@@ -78,12 +115,18 @@ class BaseSeismicSource(metaclass=abc.ABCMeta):
             return 1
 
     @property
-    def grp_ids(self):
+    def grp_id(self):
         """
-        :returns: a list of source group IDs (usually of 1 element)
+        The source group ID (or a tuple of IDs), set by the engine
         """
-        grp_id = self.grp_id
-        return [grp_id] if isinstance(grp_id, int) else grp_id
+        return self._grp_id
+
+    @grp_id.setter
+    def grp_id(self, grp_id):
+        # grp_ids is read for each sampling and each context, so it is
+        # computed here once and not at every access
+        self._grp_id = grp_id
+        self.grp_ids = [grp_id] if isinstance(grp_id, int) else grp_id
 
     def __init__(self, source_id, name, tectonic_region_type):
         self.source_id = source_id
@@ -94,8 +137,6 @@ class BaseSeismicSource(metaclass=abc.ABCMeta):
         self.seed = None  # set by the engine
         self.min_mag = 0  # set by the SourceConverter
 
-        #print(f"seed for init {self}: {self.seed}")
-
     @abc.abstractmethod
     def iter_ruptures(self, **kwargs):
         """
@@ -113,11 +154,11 @@ class BaseSeismicSource(metaclass=abc.ABCMeta):
         :yields: pairs (rupture, num_occurrences[num_samples])
         """
         rup_id = self.serial
-
-        numpy.random.seed(self.serial) # tu sample
-
+        # a local generator, giving the same numbers as calling
+        # numpy.random.seed(self.serial) without touching the global state
+        rng = numpy.random.RandomState(self.serial)
         for grp_id in self.grp_ids:
-            for rup, num_occ in self._sample_ruptures(eff_num_ses):
+            for rup, num_occ in self._sample_ruptures(eff_num_ses, rng):
                 rup.rup_id = rup_id
                 rup_id += 1
                 yield rup, grp_id, num_occ
@@ -136,27 +177,19 @@ class BaseSeismicSource(metaclass=abc.ABCMeta):
                 yield rup, grp_id
 
 
-    def _sample_ruptures(self, eff_num_ses):
-
+    def _sample_ruptures(self, eff_num_ses, rng=numpy.random):
         tom = getattr(self, 'temporal_occurrence_model', None)
         if tom:  # time-independent source
-            yield from self.sample_ruptures_poissonian(eff_num_ses)
+            yield from self.sample_ruptures_poissonian(eff_num_ses, rng)
         else:  # time-dependent source (nonparametric)
 
             mutex_weight = getattr(self, 'mutex_weight', 1)
-
-            for rup in self.iter_ruptures():
-
-                occurs = rup.sample_number_of_occurrences(eff_num_ses)
-
-                if mutex_weight < 1:
-
-                    # consider only the occurrencies below the mutex_weight
-                    aux = numpy.random.random(eff_num_ses)
-                    occurs *= (aux < mutex_weight)
-
-                num_occ = occurs.sum()
-
+            ruptures = list(self.iter_ruptures())
+            if not ruptures:
+                return
+            num_occs = sample_occurrences(
+                ruptures, eff_num_ses, mutex_weight, rng)
+            for rup, num_occ in zip(ruptures, num_occs):
                 if num_occ:
                     yield rup, num_occ
 
@@ -164,67 +197,83 @@ class BaseSeismicSource(metaclass=abc.ABCMeta):
         """
         :returns: the magnitudes of the ruptures contained in the source
         """
-        mags = set()
         if hasattr(self, 'get_annual_occurrence_rates'):
-            for mag, rate in self.get_annual_occurrence_rates():
-                mags.add(mag)
+            mags = [mag for mag, rate in self.get_annual_occurrence_rates()]
         else:  # nonparametric
-            for rup, pmf in self.data:
-                if rup.mag >= self.min_mag:
-                    mags.add(rup.mag)
-        return sorted(mags)
+            mags = [rup.mag for rup, pmf in self.data
+                    if rup.mag >= self.min_mag]
+        return numpy.unique(numpy.array(mags, float)).tolist()
 
-    def sample_ruptures_poissonian(self, eff_num_ses):
+    def sample_ruptures_poissonian(self, eff_num_ses, rng=numpy.random):
         """
         :param eff_num_ses: number of stochastic event sets * number of samples
+        :param rng: a numpy RandomState (default the global numpy.random state)
         :yields: pairs (rupture, num_occurrences[num_samples])
         """
         tom = self.temporal_occurrence_model
         if not hasattr(self, 'nodal_plane_distribution'):  # fault
-
-            ruptures = list(self.iter_ruptures())
-            rates = numpy.array([rup.occurrence_rate for rup in ruptures])
-
-            ## sampling y proba
-            lambda_ = rates * tom.time_span * eff_num_ses
-            occurs = numpy.random.poisson(lambda_)
-
-            for rup, num_occ in zip(ruptures, occurs):
-                if num_occ:
-                  yield rup, num_occ
-
-            return
+            # sample the ruptures in blocks to save memory; the Poisson
+            # draws are the same as drawing for all the ruptures at once
+            ruptures = self.iter_ruptures()
+            while True:
+                block = list(itertools.islice(ruptures, RUPTURE_BLOCK))
+                if not block:
+                    return
+                rates = numpy.fromiter((rup.occurrence_rate for rup in block),
+                                       float, len(block))
+                lambda_ = rates * tom.time_span * eff_num_ses
+                occurs = rng.poisson(lambda_)
+                for rup, num_occ in zip(block, occurs):
+                    if num_occ:
+                        yield rup, num_occ
         # else (multi)point sources and area sources
-        rup_args = []
+        blocks = []  # (src, mag_rates, np_data, hc_data) for each point
         rates = []
         for src in self:
-            for mag, mag_occ_rate in src.get_annual_occurrence_rates():
-                if mag < self.min_mag:
-                    continue
-                for np_prob, np in src.nodal_plane_distribution.data:
-                    for hc_prob, hc_depth in src.hypocenter_distribution.data:
-                        args = (mag_occ_rate, np_prob, hc_prob,
-                                mag, np, hc_depth, src)
-                        rup_args.append(args)
-                        rates.append(mag_occ_rate * np_prob * hc_prob)
-        eff_rates = numpy.array(rates) * tom.time_span * eff_num_ses
+            mag_rates = [(mag, rate) for mag, rate in
+                         src.get_annual_occurrence_rates()
+                         if mag >= self.min_mag]
+            if not mag_rates:
+                continue
+            np_data = src.nodal_plane_distribution.data
+            hc_data = src.hypocenter_distribution.data
+            # outer product mag_occ_rate * np_prob * hc_prob, flattened
+            # in (mag, np, hc) order
+            mag_occ_rates = numpy.array([rate for mag, rate in mag_rates])
+            np_probs = numpy.array([np_prob for np_prob, np in np_data])
+            hc_probs = numpy.array([hc_prob for hc_prob, hc in hc_data])
+            rates.append((mag_occ_rates[:, None, None] *
+                          np_probs[None, :, None] *
+                          hc_probs[None, None, :]).ravel())
+            blocks.append((src, mag_rates, np_data, hc_data))
+        if not rates:
+            return
+        starts = numpy.cumsum([0] + [len(r) for r in rates[:-1]])
+        rates = numpy.concatenate(rates)
+        eff_rates = rates * tom.time_span * eff_num_ses
 
         # sampling and proba
-        occurs = numpy.random.poisson(eff_rates)
-
-        for num_occ, args, rate in zip(occurs, rup_args, rates):
-            if num_occ:
-                mag_occ_rate, np_prob, hc_prob, mag, np, hc_depth, src = args
-                hc = Point(latitude=src.location.latitude,
-                           longitude=src.location.longitude,
-                           depth=hc_depth)
-                surface, _ = src._get_rupture_surface(mag, np, hc)
-                rup = ParametricProbabilisticRupture(
-                    mag, np.rake, src.tectonic_region_type, hc,
-                    surface, rate, tom,
-                    source_id=self.source_id,
-                    source_name=self.name)
-                yield rup, num_occ
+        occurs = rng.poisson(eff_rates)
+
+        # build the ruptures only for the bins with nonzero occurrences
+        for idx in occurs.nonzero()[0]:
+            b = starts.searchsorted(idx, 'right') - 1
+            src, mag_rates, np_data, hc_data = blocks[b]
+            m, n, h = numpy.unravel_index(
+                idx - starts[b], (len(mag_rates), len(np_data), len(hc_data)))
+            mag = mag_rates[m][0]
+            np = np_data[n][1]
+            hc_depth = hc_data[h][1]
+            hc = Point(latitude=src.location.latitude,
+                       longitude=src.location.longitude,
+                       depth=hc_depth)
+            surface, _ = src._get_rupture_surface(mag, np, hc)
+            rup = ParametricProbabilisticRupture(
+                mag, np.rake, src.tectonic_region_type, hc,
+                surface, rates[idx], tom,
+                source_id=self.source_id,
+                source_name=self.name)
+            yield rup, occurs[idx]
 
 
     @abc.abstractmethod
@@ -375,10 +424,7 @@ class ParametricSeismicSource(BaseSeismicSource, metaclass=abc.ABCMeta):
         num_ruptures = self.count_ruptures()
 
         # seed for rup_id
-        numpy.random.seed(self.seed) # only to give id to ruptures
-        #print(f"seed in get_one_rupture for rup_id :{self.seed}")
-
-
+        numpy.random.seed(self.seed)  # only to give id to ruptures
         idx = numpy.random.choice(num_ruptures)
         # NOTE Would be nice to have a method generating a rupture given two
         # indexes, one for magnitude and one setting the position
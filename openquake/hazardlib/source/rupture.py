@@ -25,7 +25,7 @@ import logging
 
 import numpy
 import math
-from scipy.special import loggamma
+from scipy.special import gammaln, xlogy
 
 import itertools
 import toml
@@ -253,7 +253,7 @@ class BaseRupture(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError
 
-    def proba_number_of_occurrences(self,k=1):
+    def proba_number_of_occurrences(self, k=1):
         """
         Porba to have sampled a value equal to k
         """
@@ -313,7 +313,7 @@ class NonParametricProbabilisticRupture(BaseRupture):
 
         return n_occ
 
-    def proba_number_of_occurrences(self,k=1):
+    def proba_number_of_occurrences(self, k=1):
 
         is_iter = False
 
@@ -406,10 +406,24 @@ class ParametricProbabilisticRupture(BaseRupture):
 
         return res
 
-    def proba_number_of_occurrences(self,k=1):
-
+    def proba_number_of_occurrences(self, k=1):
+        """
+        Poisson probability of having k occurrences in the time span
+        """
         r = self.occurrence_rate * self.temporal_occurrence_model.time_span
-        return numpy.exp(k * numpy.log(r) - r - loggamma(k+1))
+        k = numpy.asarray(k)
+        if k.ndim == 0:
+            # gammaln is real-valued and faster than loggamma; xlogy is 0
+            # for k=0 and avoids a log(0) warning if the rate is 0
+            return numpy.exp(xlogy(k, r) - r - gammaln(k + 1))
+        # the probability of no occurrences is simply exp(-r), so the
+        # special functions are computed only for the nonzero elements,
+        # which are few for low rates
+        probas = numpy.full(k.shape, numpy.exp(-r))
+        nz = k != 0
+        knz = k[nz]
+        probas[nz] = numpy.exp(xlogy(knz, r) - r - gammaln(knz + 1))
+        return probas
 
 
     def get_probability_no_exceedance(self, poes):
@@ -886,8 +900,6 @@ class RuptureProxy(object):
         self.nsites = nsites
         self.samples = samples
 
-        #print(f"RuptureProxy")
-
     @property
     def weight(self):
         """
@@ -16,8 +16,10 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with OpenQuake.  If not, see <http://www.gnu.org/licenses/>.
 import os
+import pickle
 import unittest
 from numpy.testing import assert_almost_equal as aae
+from openquake.baselib import hdf5
 from openquake.baselib.general import gettemp
 from openquake.hazardlib import nrml
 from openquake.hazardlib.geo.point import Point
@@ -85,6 +87,21 @@ class SourceFilterTestCase(unittest.TestCase):
         sites = srcfilter.get_close_sites(src)
         self.assertIsNotNone(sites)
 
+    def test_sitecol_from_file(self):
+        sitecol = SiteCollection([
+            Site(location=Point(10, 20), vs30=760., z1pt0=40, z2pt5=1)])
+        fname = gettemp(suffix='.hdf5')
+        with hdf5.File(fname, 'w') as h5:
+            h5['sitecol'] = sitecol
+        srcfilter = SourceFilter(sitecol, {'default': 40}, fname)
+        # only the filename is pickled
+        self.assertNotIn(b'SiteCollection', pickle.dumps(srcfilter))
+        f1 = pickle.loads(pickle.dumps(srcfilter))
+        f2 = pickle.loads(pickle.dumps(srcfilter))
+        aae(f1.sitecol.lons, sitecol.lons)
+        # the site collection is read once per process
+        self.assertIs(f1.sitecol, f2.sitecol)
+
 
 # from https://groups.google.com/d/msg/openquake-users/P03SxJsfW_s/nCdcxj8WAAAJ
 characteric_source = '''\
@@ -15,11 +15,14 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import pickle
 import unittest
+import unittest.mock as mock
 import numpy
 import numpy.testing as npt
 
 from openquake.baselib.general import DictArray
+from openquake.hazardlib import contexts
 from openquake.hazardlib.source import NonParametricSeismicSource
 from openquake.hazardlib.source.rupture import BaseRupture
 from openquake.hazardlib.sourceconverter import SourceConverter
@@ -134,6 +137,41 @@ class HazardCurvesTestCase01(unittest.TestCase):
                                 curves[0][0], decimal=4)
 
 
+    def test_cache_poes(self):
+        # two branches with the same rupture and different probabilities,
+        # computed in different tasks, each one with its own unpickled
+        # filter: the PoEs of the second branch are taken from the cache
+        src4 = _create_non_param_sourceA(10., 6.0, PMF([(0.6, 0), (0.4, 1)]))
+        gsims = [SadighEtAl1997()]
+        param = dict(imtls=self.imtls, filter_distance='rjb')
+        expected = []
+        for src in (self.src2, src4):
+            src.id = src.grp_id = 0
+            group = SourceGroup(
+                TRT.ACTIVE_SHALLOW_CRUST, [src], 'test', 'indep', 'indep')
+            pmap = classical(group, self.sites, gsims, param)['pmap'][0]
+            expected.append(pmap[0].array)
+        contexts._poes_cache.clear()
+        param['cache_poes'] = True
+        got = []
+        with mock.patch('openquake.hazardlib.gsim.base.get_mean_std',
+                        wraps=contexts.base.get_mean_std) as get_mean_std:
+            for src in (self.src2, src4):
+                group = SourceGroup(
+                    TRT.ACTIVE_SHALLOW_CRUST, [src], 'test', 'indep', 'indep')
+                sites = pickle.loads(pickle.dumps(self.sites))
+                pmap = classical(group, sites, gsims, param)['pmap'][0]
+                got.append(pmap[0].array)
+        self.assertEqual(get_mean_std.call_count, 1)  # one cache hit
+        for arr, exp in zip(got, expected):
+            npt.assert_allclose(arr, exp)
+        self.assertFalse(numpy.allclose(*expected))  # different branches
+        # the PoEs are dropped when a task of another calculation starts
+        self.assertTrue(contexts._poes_cache)
+        contexts._reset_poes_cache((1, None))
+        self.assertFalse(contexts._poes_cache)
+
+
 class HazardCurvePerGroupTest(HazardCurvesTestCase01):
 
     def test_mutually_exclusive_ruptures(self):
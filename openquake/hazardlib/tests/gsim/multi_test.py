@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright (C) 2020, GEM Foundation
+#
+# OpenQuake is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# OpenQuake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with OpenQuake.  If not, see <http://www.gnu.org/licenses/>.
+import pickle
+import unittest
+import numpy
+from openquake.hazardlib import const
+from openquake.hazardlib.imt import PGA, SA
+from openquake.hazardlib.contexts import DistancesContext
+from openquake.hazardlib.gsim.base import get_mean_std
+from openquake.hazardlib.gsim.multi import MultiGMPE
+from openquake.hazardlib.tests.gsim.mgmpe.dummy import Dummy
+
+
+def multi_gmpe():
+    return MultiGMPE(**{'PGA': {'AkkarBommer2010': {}},
+                        'SA(0.1)': {'SadighEtAl1997': {}}})
+
+
+class MultiGMPETestCase(unittest.TestCase):
+    def test_get_mean_std(self):
+        gsim = multi_gmpe()
+        sites = Dummy.get_site_collection(3, vs30=760.)
+        rup = Dummy.get_rupture(mag=6.0)
+        dists = DistancesContext()
+        dists.rrup = numpy.array([1., 10., 30.])
+        dists.rjb = numpy.array([1., 10., 30.])
+        imts = [PGA(), SA(0.1)]
+        arr = get_mean_std(sites, rup, dists, imts, [gsim])
+        self.assertEqual(arr.shape, (2, 3, 2, 1))
+        for m, imt in enumerate(imts):
+            mean, [std] = gsim.get_mean_and_stddevs(
+                sites, rup, dists, imt, [const.StdDev.TOTAL])
+            numpy.testing.assert_allclose(arr[0, :, m, 0], mean)
+            numpy.testing.assert_allclose(arr[1, :, m, 0], std)
+
+    def test_instance_sets(self):
+        # the sets must be per instance, not shared with the class
+        gsim = multi_gmpe()
+        other = MultiGMPE(**{'PGV': {'AkkarBommer2010': {}}})
+        self.assertEqual(MultiGMPE.REQUIRES_DISTANCES, set())
+        self.assertEqual(MultiGMPE.DEFINED_FOR_INTENSITY_MEASURE_TYPES, set())
+        self.assertEqual(gsim.REQUIRES_DISTANCES, {'rjb', 'rrup'})
+        self.assertEqual(other.REQUIRES_DISTANCES, {'rjb'})
+
+    def test_hash_eq(self):
+        gsim = multi_gmpe()
+        self.assertEqual(hash(gsim), hash(multi_gmpe()))
+        self.assertEqual(gsim, multi_gmpe())
+        other = MultiGMPE(**{'PGA': {'AkkarBommer2010': {}}})
+        self.assertNotEqual(gsim, other)
+        self.assertEqual({gsim: 1}[multi_gmpe()], 1)
+        # the cached hash is recomputed after unpickling
+        copy = pickle.loads(pickle.dumps(gsim))
+        self.assertEqual(hash(copy), hash(gsim))
+        self.assertEqual(copy, gsim)
+
+    def test_mapping(self):
+        gsim = multi_gmpe()
+        self.assertEqual(list(gsim), ['PGA', 'SA(0.1)'])
+        self.assertEqual(len(gsim), 2)
+        self.assertIn('PGA', gsim)
+        self.assertNotIn('PGV', gsim)
+        self.assertEqual(dict(gsim), dict(gsim.items()))
+        self.assertEqual(str(gsim['PGA']), '[AkkarBommer2010]')
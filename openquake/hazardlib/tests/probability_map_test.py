@@ -18,7 +18,8 @@
 
 import unittest
 import numpy
-from openquake.hazardlib.probability_map import ProbabilityMap
+from openquake.hazardlib.probability_map import (
+    ProbabilityMap, combine, compose, combine_poes, _combine_poes)
 
 
 class ProbabilityMapTestCase(unittest.TestCase):
@@ -40,3 +41,52 @@ class ProbabilityMapTestCase(unittest.TestCase):
         # test pmap power
         pmap = pmap1 ** 2
         numpy.testing.assert_almost_equal(pmap[0].array, [[.16], [0], [0]])
+
+    def test_combine(self):
+        pmap1 = ProbabilityMap.build(3, 1, sids=[0, 1])
+        pmap1[0].array[0] = .4
+        pmap2 = ProbabilityMap.build(3, 1, sids=[1, 2])
+        pmap2[1].array[1] = .5
+        pmap3 = ProbabilityMap.build(3, 1, sids=[0])
+        pmap3[0].array[0] = .5
+        pmap = combine([pmap1, pmap2, pmap3])
+        expected = pmap1 | pmap2 | pmap3
+        self.assertEqual(sorted(pmap), [0, 1, 2])
+        for sid in expected:
+            numpy.testing.assert_allclose(pmap[sid].array, expected[sid].array)
+        # the inputs are not modified
+        numpy.testing.assert_equal(pmap1[0].array, [[.4], [0], [0]])
+
+    def test_compose(self):
+        pmap1 = ProbabilityMap.build(3, 1, sids=[0, 1])
+        pmap1[0].array[0] = .4
+        pmap2 = ProbabilityMap.build(3, 1, sids=[1, 2])
+        pmap2[1].array[1] = .5
+        expected = pmap1 | pmap2
+        acc = ProbabilityMap(3, 1)
+        compose(acc, pmap1)
+        curve0 = acc[0]
+        compose(acc, pmap2)
+        self.assertIs(acc[0], curve0)  # updated in place
+        for sid in expected:
+            numpy.testing.assert_allclose(acc[sid].array, expected[sid].array)
+        # the curves of the inputs are copied, not shared
+        self.assertIsNot(acc[2].array, pmap2[2].array)
+        numpy.testing.assert_equal(pmap1[1].array, [[0], [0], [0]])
+        # the shapes are checked as in |=, even if numpy could broadcast
+        with self.assertRaisesRegex(ValueError, 'inconsistent shape'):
+            compose(acc, ProbabilityMap.build(1, 1, sids=[0]))
+
+    def test_combine_poes(self):
+        # the numba ufunc (if numba is installed) and the numpy fallback
+        # must give the same results, with and without an output array
+        a = numpy.array([[.1, .2], [0, 1]])
+        b = numpy.array([[.5, .5], [.3, .4]])
+        expected = [[.55, .6], [.3, 1]]
+        for func in (combine_poes, _combine_poes):
+            numpy.testing.assert_allclose(func(a, b), expected)
+            out = a.copy()
+            func(out, b, out=out)
+            numpy.testing.assert_allclose(out, expected)
+            a32 = a.astype(numpy.float32)
+            self.assertEqual(func(a32, a32).dtype, numpy.float32)
@@ -63,6 +63,23 @@ class _BaseSeismicSourceTestCase(unittest.TestCase):
         self.sitecol = SiteCollection(self.SITES)
 
 
+class GrpIdTestCase(_BaseSeismicSourceTestCase):
+    def test_grp_ids(self):
+        self.assertEqual(self.source.grp_ids, [-1])
+        self.source.grp_id = (1, 2)
+        self.assertEqual(self.source.grp_ids, (1, 2))
+        self.source.grp_id = 3
+        self.assertEqual(self.source.grp_id, 3)
+        self.assertEqual(self.source.grp_ids, [3])
+
+    def test_no_init(self):
+        # sources not calling BaseSeismicSource.__init__, like the
+        # UCERFSource, get the class-level defaults
+        src = FakeSource.__new__(FakeSource)
+        self.assertEqual(src.grp_id, ())
+        self.assertEqual(src.grp_ids, ())
+
+
 class SeismicSourceGetAnnOccRatesTestCase(_BaseSeismicSourceTestCase):
     def setUp(self):
         super().setUp()
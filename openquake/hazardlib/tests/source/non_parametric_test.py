@@ -91,3 +91,19 @@ class NonParametricSourceTestCase(unittest.TestCase):
     def test_count_ruptures(self):
         source, _ = self.make_non_parametric_source()
         self.assertEqual(source.count_ruptures(), 2)
+
+    def test_sample_ruptures(self):
+        # the vectorized sampling must consume the random numbers in the
+        # same order as sampling the ruptures one by one
+        source, _ = self.make_non_parametric_source()
+        source.mutex_weight = .5
+        numpy.random.seed(42)
+        expected = []
+        for rup in source.iter_ruptures():
+            occurs = rup.sample_number_of_occurrences(10)
+            occurs *= numpy.random.random(10) < .5
+            if occurs.sum():
+                expected.append((rup.mag, occurs.sum()))
+        numpy.random.seed(42)
+        got = [(rup.mag, n) for rup, n in source._sample_ruptures(10)]
+        self.assertEqual(got, expected)
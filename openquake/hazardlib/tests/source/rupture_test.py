@@ -102,6 +102,17 @@ class ParametricProbabilisticRuptureTestCase(unittest.TestCase):
         self.assertAlmostEqual(rupture.get_probability_one_occurrence(),
                                0.0732626)
 
+    def test_proba_number_of_occurrences(self):
+        rupture = make_rupture(ParametricProbabilisticRupture,
+                               occurrence_rate=0.4,
+                               temporal_occurrence_model=PoissonTOM(10))
+        # Poisson pmf with rate 4
+        self.assertAlmostEqual(rupture.proba_number_of_occurrences(1),
+                               0.0732626)
+        numpy.testing.assert_allclose(
+            rupture.proba_number_of_occurrences(numpy.array([0, 2, 0, 1])),
+            [0.0183156, 0.1465251, 0.0183156, 0.0732626], atol=1e-7)
+
     def test_sample_number_of_occurrences(self):
         time_span = 20
         rate = 0.01
@@ -391,6 +391,18 @@ def log(db, job_id, timestamp, level, process, message):
        'VALUES (?X)', (job_id, timestamp, level, process, message))
 
 
+def log_many(db, rows):
+    """
+    Write several log records in the database with a single command.
+
+    :param db:
+        a :class:`openquake.server.dbapi.Db` instance
+    :param rows:
+        a list of tuples (job_id, timestamp, level, process, message)
+    """
+    db.insert('log', 'job_id timestamp level process message'.split(), rows)
+
+
 def get_log(db, job_id):
     """
     Extract the logs as a big string
@@ -188,6 +188,7 @@ NotFound
 """
 import re
 import threading
+import itertools
 import collections
 
 
@@ -362,12 +363,29 @@ class Db(object):
     def insert(self, table, columns, rows):
         """
         Insert several rows with executemany. Return a cursor.
+        The rows are inserted in a single transaction, even if the
+        connection is in autocommit mode. `rows` can be any iterable,
+        for instance a generator, and it is consumed lazily.
         """
         cursor = self.conn.cursor()
-        if len(rows):
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is not None:
             templ, _args = match('INSERT INTO ?s (?S) VALUES (?X)',
-                                 table, columns, rows[0])
-            cursor.executemany(templ, rows)
+                                 table, columns, first)
+            rows = itertools.chain([first], rows)
+            # in autocommit mode every row would be a transaction
+            begin = not getattr(self.conn, 'in_transaction', True)
+            if begin:
+                cursor.execute('BEGIN')
+            try:
+                cursor.executemany(templ, rows)
+            except Exception:
+                if begin:
+                    cursor.execute('ROLLBACK')
+                raise
+            if begin:
+                cursor.execute('COMMIT')
         return cursor
 
     def close(self):
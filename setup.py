@@ -84,6 +84,7 @@ extras_require = {
         'pyproj >=1.9',
     ],
     'platform': ["GDAL >=2.3, <3"],
+    'numba': ["numba"],
     'dev':  [
         'pytest >=4.5',
         'flake8 >=3.5, <3.8',